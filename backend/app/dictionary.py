@@ -0,0 +1,167 @@
+"""Prefix search and browsing over the Odia–Desia dictionary (train/data/dict.csv).
+
+Entries are indexed once, at first use, in one prefix trie per language. Keys
+are normalized Odia/Desia forms: each "/" or "," alternative of a cell, plus
+every word-start inside it, so "ଧୀରେ" also finds "ଧୀରେ ଧୀରେ". Every trie node
+keeps the ids of all entries below it already sorted by rank, so a suggestion
+is a walk down the prefix plus a slice. Rank is corpus frequency in
+merged_texts_corrected.csv (a form counts as often as its rarest word).
+"""
+import csv
+import heapq
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'train' / 'data'
+LANGUAGES = ("odia", "desia")
+
+# Zero-width (non-)joiners are used inconsistently after virama in the data
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200c\u200d\ufeff"))
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "").translate(_ZERO_WIDTH)
+    return " ".join(text.casefold().split())
+
+
+def split_forms(cell: str) -> List[str]:
+    forms = [normalize(part) for chunk in (cell or "").split("/") for part in chunk.split(",")]
+    return [f for f in forms if f]
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.ids: List[int] = []
+
+
+class DictionaryIndex:
+    def __init__(self, entries: List[dict], frequencies: Counter):
+        self.entries = entries
+        self.categories = sorted({e["category"] for e in entries})
+        for entry in entries:
+            entry["frequency"] = max(
+                (min(frequencies[w] for w in form.split()) for lang in LANGUAGES for form in entry["_forms"][lang]),
+                default=0,
+            )
+        # rank[id] = position in suggestion order: most frequent first, then shorter, then file order
+        order = sorted(range(len(entries)),
+                       key=lambda i: (-entries[i]["frequency"], len(entries[i]["odia"]), i))
+        self.rank = [0] * len(entries)
+        for position, entry_id in enumerate(order):
+            self.rank[entry_id] = position
+        self.tries = {lang: self._build_trie(lang) for lang in LANGUAGES}
+        self.by_category: Dict[str, List[int]] = {}
+        for entry in entries:
+            self.by_category.setdefault(entry["category"], []).append(entry["id"])
+
+    def _build_trie(self, lang: str) -> _Node:
+        root = _Node()
+        for entry in self.entries:
+            for key in _index_keys(entry["_forms"][lang]):
+                node = root
+                for ch in key:
+                    node = node.children.setdefault(ch, _Node())
+                    node.ids.append(entry["id"])
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.ids = sorted(set(node.ids), key=self.rank.__getitem__)
+            stack.extend(node.children.values())
+        return root
+
+    def _lookup(self, lang: str, prefix: str) -> List[int]:
+        node = self.tries[lang]
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.ids
+
+    def _stream(self, lang: str, prefix: str) -> Iterable[Tuple[int, int, int, str]]:
+        # When both forms of an entry match, the language listed first in
+        # LANGUAGES (Odia) is reported as `matched`
+        priority = LANGUAGES.index(lang)
+        return ((self.rank[i], i, priority, lang) for i in self._lookup(lang, prefix))
+
+    def suggest(self, query: str, lang: str = "any", category: Optional[str] = None, limit: int = 10) -> List[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        langs = LANGUAGES if lang == "any" else (lang,)
+        streams = [self._stream(l, prefix) for l in langs]
+        results, seen = [], set()
+        for _, entry_id, _, matched in heapq.merge(*streams):
+            if entry_id in seen:
+                continue
+            seen.add(entry_id)
+            entry = self.entries[entry_id]
+            if category and entry["category"] != category:
+                continue
+            results.append({**public_entry(entry), "matched": matched})
+            if len(results) >= limit:
+                break
+        return results
+
+    def browse(self, category: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], Optional[str], int]:
+        """A page of entries in dictionary order, starting at `cursor` (a previous page's next cursor)."""
+        ids = self.by_category.get(category, []) if category else range(len(self.entries))
+        start = bisect.bisect_left(ids, int(cursor)) if cursor else 0
+        page = ids[start:start + limit]
+        next_cursor = str(ids[start + limit]) if start + limit < len(ids) else None
+        return [public_entry(self.entries[i]) for i in page], next_cursor, len(ids)
+
+
+def _index_keys(forms: Iterable[str]) -> Iterable[str]:
+    for form in forms:
+        words = form.split()
+        for i in range(len(words)):
+            yield " ".join(words[i:])
+
+
+def public_entry(entry: dict) -> dict:
+    return {k: v for k, v in entry.items() if not k.startswith("_")}
+
+
+def _read_csv(name: str) -> List[dict]:
+    with open(DATA_DIR / name, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def load_index() -> DictionaryIndex:
+    entries = []
+    for row in _read_csv("dict.csv"):
+        odia, desia = (row.get("odia_word") or "").strip(), (row.get("desia_word") or "").strip()
+        if not odia and not desia:
+            continue
+        entries.append({
+            "id": len(entries),
+            "odia": odia,
+            "desia": desia,
+            "category": (row.get("cateegory") or "").strip(),
+            "_forms": {"odia": split_forms(odia), "desia": split_forms(desia)},
+        })
+    frequencies = Counter()
+    for row in _read_csv("merged_texts_corrected.csv"):
+        for column in ("odia_word", "desia_word", "desia_sentence"):
+            frequencies.update(normalize(row.get(column) or "").replace("/", " ").replace(",", " ").split())
+    return DictionaryIndex(entries, frequencies)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dictionary() -> DictionaryIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_index()
+    return _index
@@ -0,0 +1,115 @@
+"""Incremental live translation over a WebSocket session.
+
+The client sends the full input text on every change:
+
+    {"seq": 7, "text": "...", "source_language": "eng_Latn", "target_language": "ory_Orya"}
+
+The session splits it into sentences and only translates sentences it has not
+translated before. A newer message cancels the run for the previous one, and a
+session has at most one model call in flight: a newer run waits for the
+current call (whose result is cached) and then translates its own, latest
+text. A burst of keystrokes inside one sentence therefore costs the call that
+was already running plus one for the final text, not one per keystroke.
+
+Replies, all tagged with the ``seq`` they answer:
+ - ``{"type": "sentence", "index", "source", "translation", "cached"}`` for every
+   index whose translation differs from what the client was last sent
+ - ``{"type": "done", "count", "translated"}`` once all sentences are current
+   (``count`` is the new sentence count, ``translated`` how many were new)
+ - ``{"type": "error", "detail"}`` if the message could not be translated
+"""
+import re
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+# Sentence ends: Latin punctuation, Odia danda/double danda, and the ASCII "|"
+# the corpus uses as a danda; newlines always end a sentence.
+SENTENCE_BREAK = re.compile(r"(?<=[.!?।॥|])\s+|\n+")
+CACHE_SIZE = 512
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_BREAK.split(text) if s.strip()]
+
+
+class LiveTranslationSession:
+    """Per-connection state: translated sentences, in-flight work, last output."""
+
+    def __init__(self, translate: Callable[..., Awaitable[str]], send: Callable[[dict], Awaitable[None]]):
+        # translate(model, "translate", text, source, target), i.e. main.run_translation
+        self._translate = translate
+        self._send = send
+        self._cache: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._inflight: Optional[Tuple[Tuple, asyncio.Task]] = None
+        self._sent: List[Optional[str]] = []
+        self._run: Optional[asyncio.Task] = None
+
+    def submit(self, message: dict) -> None:
+        """Start translating `message`, cancelling the run for any older one."""
+        if self._run is not None:
+            self._run.cancel()
+        self._run = asyncio.create_task(self._translate_message(message))
+
+    def close(self) -> None:
+        if self._run is not None:
+            self._run.cancel()
+        if self._inflight is not None:
+            # With the replica pool this also drops the call if it is still queued
+            self._inflight[1].cancel()
+
+    async def _sentence(self, key: Tuple) -> Tuple[str, bool]:
+        # Never start a second call: let the running one finish first. Its
+        # sentence may still be in the text, and it cannot be stopped once the
+        # model is running anyway.
+        while self._inflight is not None and self._inflight[0] != key:
+            await asyncio.wait({self._inflight[1]})
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key], True
+        if self._inflight is None:
+            model, source, target, sentence = key
+            task = asyncio.create_task(self._translate(model, "translate", sentence, source, target))
+            task.add_done_callback(lambda t, key=key: self._store(key, t))
+            self._inflight = (key, task)
+        # Shielded: cancelling a stale run must not cancel the call newer runs wait on
+        return await asyncio.shield(self._inflight[1]), False
+
+    def _store(self, key: Tuple, task: asyncio.Task) -> None:
+        if self._inflight is not None and self._inflight[1] is task:
+            self._inflight = None
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._cache[key] = task.result()
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _translate_message(self, message: dict) -> None:
+        seq = message.get("seq")
+        try:
+            sentences = split_sentences(message.get("text", ""))
+            translated = 0
+            for index, sentence in enumerate(sentences):
+                key = (message.get("model"), message["source_language"], message["target_language"], sentence)
+                translation, cached = await self._sentence(key)
+                translated += not cached
+                if index < len(self._sent):
+                    if self._sent[index] == translation:
+                        continue
+                    self._sent[index] = translation
+                else:
+                    self._sent.append(translation)
+                await self._send({"type": "sentence", "seq": seq, "index": index, "source": sentence,
+                                  "translation": translation, "cached": cached})
+            del self._sent[len(sentences):]
+            await self._send({"type": "done", "seq": seq, "count": len(sentences), "translated": translated})
+        except asyncio.CancelledError:
+            raise
+        except (KeyError, ValueError) as e:
+            await self._send({"type": "error", "seq": seq, "detail": str(e)})
+        except Exception as e:
+            logger.exception("Live translation error")
+            await self._send({"type": "error", "seq": seq, "detail": f"Translation error: {e}"})
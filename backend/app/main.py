@@ -1,18 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+import anyio.to_thread
+import asyncio
 import logging
+from typing import Optional
 import traceback
 from fastapi.middleware.cors import CORSMiddleware
 from .schemas import (
     TranslateRequest, 
     TranslateResponse, 
+    MultiTranslateRequest,
+    MultiTranslateResponse,
+    DictionarySuggestResponse,
+    DictionaryBrowseResponse,
     DetectRequest, 
     DetectResponse,
     ChatGPTTranslateRequest,
     ChatGPTTranslateResponse
 )
 from .model import (
-    translate,
+    get_replica_pool,
+    start_replica_pool,
     MODEL_NAME,
+    NLLB_LOCAL_CONCURRENCY,
     ODIA_CODE,
     ENGLISH_CODE,
     detect_language,
@@ -29,6 +39,10 @@ from .chatgpt_service import (
     prime_dictionary_guidelines,
     get_dictionary_guidelines
 )
+from .registry import get_registry, merge_listings
+from .live import LiveTranslationSession
+from .dictionary import get_dictionary
+from . import profiling
 
 app = FastAPI(
     title="Desia Translation API", 
@@ -36,22 +50,28 @@ app = FastAPI(
     description="Translation API with NLLB and ChatGPT support for Odia-Desia-English"
 )
 
+ALLOWED_ORIGINS = [
+    "http://localhost:5173", 
+    "http://127.0.0.1:5173", 
+    "http://localhost:5174", 
+    "http://127.0.0.1:5174"
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173", 
-        "http://127.0.0.1:5173", 
-        "http://localhost:5174", 
-        "http://127.0.0.1:5174"
-    ],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"]
 )
 
+# Opt-in request profiling; the middleware is only installed when PROFILE_DIR is set
+if profiling.PROFILING_ENABLED:
+    app.middleware("http")(profiling.profile_middleware)
+
 API_PREFIX = "/api"
 
-# Initialize ChatGPT client on startup
+# Initialize ChatGPT client, dictionary index and the optional NLLB replica pool on startup
 @app.on_event("startup")
 async def startup_event():
     try:
@@ -60,15 +80,66 @@ async def startup_event():
     except Exception as e:
         logging.warning(f"ChatGPT initialization failed: {e}. ChatGPT endpoints will not work.")
 
+    # Build the dictionary index now so the first suggest call is not slow
+    get_dictionary()
+
+    try:
+        pool = start_replica_pool()
+        if pool is not None:
+            logging.info(f"Started {len(pool)} NLLB replicas")
+    except Exception as e:
+        logging.warning(f"Replica pool startup failed: {e}. Falling back to in-process translation.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    pool = get_replica_pool()
+    if pool is not None:
+        pool.shutdown()
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call in a worker thread, under the request's profiler if it is profiled."""
+    return await run_in_threadpool(profiling.profiled(fn), *args, **kwargs)
+
+_engine_limiter = None
+
+def engine_limiter() -> anyio.CapacityLimiter:
+    """Caps in-process engine calls at NLLB_LOCAL_CONCURRENCY (the threadpool allows 40)."""
+    global _engine_limiter
+    if _engine_limiter is None:
+        _engine_limiter = anyio.CapacityLimiter(NLLB_LOCAL_CONCURRENCY)
+    return _engine_limiter
+
+async def run_translation(model_name: Optional[str], method: str, *args, **kwargs):
+    """Run a TranslationEngine method of a registry model off the event loop.
+
+    Uses the replica pool when NLLB_REPLICAS is set, otherwise a worker thread
+    limited by `engine_limiter()`: the engine is reentrant, but concurrent
+    generate() calls would each start a full-width torch thread team. Profiled
+    requests always use a local worker thread so the profiler sees the model work.
+    """
+    registry = get_registry()
+    model_name = registry.resolve(model_name)
+    pool = get_replica_pool()
+    if pool is not None and not profiling.is_profiling():
+        return await asyncio.wrap_future(pool.submit(model_name, method, *args, **kwargs))
+    call = profiling.profiled(lambda: getattr(registry.get(model_name), method)(*args, **kwargs))
+    return await anyio.to_thread.run_sync(call, limiter=engine_limiter())
+
 @app.get(f"{API_PREFIX}/health")
 async def health():
     return {"status": "ok", "services": ["nllb", "chatgpt"]}
 
 @app.get(f"{API_PREFIX}/languages")
 async def languages():
+    models = get_registry().list_models()
+    pool = get_replica_pool()
+    if pool is not None:
+        # Replicas load non-default models in their own registries
+        models = merge_listings(models, await run_in_threadpool(pool.list_models))
     return {
         "supported": list_supported_language_codes() + ["desia"],
         "model": MODEL_NAME,
+        "models": models,
         "chatgpt_enabled": True
     }
 
@@ -76,10 +147,11 @@ async def languages():
 @app.post(f"{API_PREFIX}/translate", response_model=TranslateResponse)
 async def translate_generic(req: TranslateRequest):
     try:
-        translated = translate(req.text, req.source_language, req.target_language)
+        translated = await run_translation(req.model, "translate", req.text, req.source_language, req.target_language,
+                                           num_beams=req.num_beams, speculative=req.speculative)
         return TranslateResponse(
             translated_text=translated,
-            model=MODEL_NAME,
+            model=req.model or MODEL_NAME,
             source_language=req.source_language,
             target_language=req.target_language
         )
@@ -89,18 +161,79 @@ async def translate_generic(req: TranslateRequest):
         logging.getLogger("uvicorn.error").exception("Translation error")
         raise HTTPException(status_code=500, detail=f"Translation error: {e}")
 
+@app.post(f"{API_PREFIX}/translate_multi", response_model=MultiTranslateResponse)
+async def translate_fan_out(req: MultiTranslateRequest):
+    """
+    Translate one text into several targets in a single call. NLLB targets share
+    one encoder pass; "desia" is produced from the Odia output via ChatGPT.
+    """
+    nllb_targets = [t for t in req.target_languages if t not in ("desia", req.source_language)]
+    if "desia" in req.target_languages and req.source_language != ODIA_CODE and ODIA_CODE not in nllb_targets:
+        nllb_targets.append(ODIA_CODE)
+    try:
+        outputs = await run_translation(req.model, "translate_multi", req.text, req.source_language, nllb_targets)
+        outputs[req.source_language] = req.text.strip()
+        if "desia" in req.target_languages and req.source_language != "desia":
+            outputs["desia"] = await run_blocking(
+                translate_odia_to_desia_chatgpt, outputs[ODIA_CODE], model=req.chatgpt_model
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.getLogger("uvicorn.error").exception("Fan-out translation error")
+        raise HTTPException(status_code=500, detail=f"Translation error: {e}")
+    return MultiTranslateResponse(
+        translations={t: outputs[t] for t in req.target_languages},
+        model=req.model or MODEL_NAME,
+        source_language=req.source_language
+    )
+
+@app.websocket(f"{API_PREFIX}/ws/translate")
+async def live_translate(websocket: WebSocket):
+    """
+    Live translation while typing: each message carries the full text, and only
+    sentences that changed since the last message are retranslated.
+    """
+    # CORSMiddleware does not cover WebSockets: without this check any page
+    # could open a session. Clients that send no Origin are not browsers.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    session = LiveTranslationSession(run_translation, websocket.send_json)
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError, TypeError):
+                # Not JSON, or a binary frame
+                await websocket.send_json({"type": "error", "seq": None, "detail": "Messages must be JSON text frames"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "seq": None, "detail": "Messages must be JSON objects"})
+                continue
+            session.submit(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+
 @app.post(f"{API_PREFIX}/translate_eng_to_odia", response_model=TranslateResponse)
 async def translate_eng_to_odia(req: TranslateRequest):
     if req.source_language != ENGLISH_CODE:
         raise HTTPException(status_code=400, detail=f"source_language must be {ENGLISH_CODE}")
     try:
-        translated = translate(req.text, ENGLISH_CODE, ODIA_CODE)
+        translated = await run_translation(req.model, "translate", req.text, ENGLISH_CODE, ODIA_CODE,
+                                           num_beams=req.num_beams, speculative=req.speculative)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.getLogger("uvicorn.error").exception("Translation error (eng→odia)")
         raise HTTPException(status_code=500, detail=f"Translation error: {e}")
     return TranslateResponse(
         translated_text=translated,
-        model=MODEL_NAME,
+        model=req.model or MODEL_NAME,
         source_language=ENGLISH_CODE,
         target_language=ODIA_CODE
     )
@@ -110,23 +243,66 @@ async def translate_odia_to_eng(req: TranslateRequest):
     if req.source_language != ODIA_CODE:
         raise HTTPException(status_code=400, detail=f"source_language must be {ODIA_CODE}")
     try:
-        translated = translate(req.text, ODIA_CODE, ENGLISH_CODE)
+        translated = await run_translation(req.model, "translate", req.text, ODIA_CODE, ENGLISH_CODE,
+                                           num_beams=req.num_beams, speculative=req.speculative)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.getLogger("uvicorn.error").exception("Translation error (odia→eng)")
         raise HTTPException(status_code=500, detail=f"Translation error: {e}")
     return TranslateResponse(
         translated_text=translated,
-        model=MODEL_NAME,
+        model=req.model or MODEL_NAME,
         source_language=ODIA_CODE,
         target_language=ENGLISH_CODE
     )
 
+@app.get(f"{API_PREFIX}/stats/speculative")
+async def speculative_stats(model: Optional[str] = None):
+    """Draft acceptance rate and speedup over greedy decoding, per language pair.
+
+    The speedup needs greedy baselines: translate requests with "num_beams": 1
+    (and no "speculative") are timed for it. Counted per process: with
+    NLLB_REPLICAS this reports one replica.
+    """
+    try:
+        return await run_translation(model, "speculative_stats")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post(f"{API_PREFIX}/detect", response_model=DetectResponse)
 async def detect(req: DetectRequest):
     code, confidence = detect_language(req.text)
     return DetectResponse(language_code=code, confidence=confidence)
 
 
+# ============ Dictionary endpoints ============
+
+@app.get(f"{API_PREFIX}/dictionary/suggest", response_model=DictionarySuggestResponse)
+async def dictionary_suggest(
+    q: str = Query(..., min_length=1, description="Prefix typed so far"),
+    lang: str = Query("any", pattern="^(any|odia|desia)$"),
+    category: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Word suggestions for a prefix, most frequent in the corpus first."""
+    return DictionarySuggestResponse(query=q, suggestions=get_dictionary().suggest(q, lang, category, limit))
+
+@app.get(f"{API_PREFIX}/dictionary/browse", response_model=DictionaryBrowseResponse)
+async def dictionary_browse(
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Page through the dictionary in order, optionally within one category."""
+    index = get_dictionary()
+    try:
+        entries, next_cursor, total = index.browse(category, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+    return DictionaryBrowseResponse(entries=entries, next_cursor=next_cursor, total=total, categories=index.categories)
+
+
 # ============ ChatGPT-based translation endpoints ============
 
 @app.post(f"{API_PREFIX}/chatgpt/translate", response_model=ChatGPTTranslateResponse)
@@ -136,15 +312,17 @@ async def chatgpt_translate(req: ChatGPTTranslateRequest):
     """
     try:
         if req.use_context:
-            translated, model = translate_with_context(
-                req.text, 
+            translated, model = await run_blocking(
+                translate_with_context,
+                req.text,
                 req.source_language, 
                 req.target_language,
                 model=req.model,
                 use_full_dictionary=req.use_full_dictionary
             )
         else:
-            translated, model = translate_with_chatgpt(
+            translated, model = await run_blocking(
+                translate_with_chatgpt,
                 req.text,
                 req.source_language,
                 req.target_language,
@@ -167,7 +345,7 @@ async def chatgpt_translate(req: ChatGPTTranslateRequest):
 async def chatgpt_prime(model: str = "gpt-4o-mini"):
     """Prime ChatGPT by summarizing full dictionary into guideline block."""
     try:
-        guidelines = prime_dictionary_guidelines(model=model)
+        guidelines = await run_blocking(prime_dictionary_guidelines, model=model)
         return {"status":"ok","model":model,"guidelines_tokens_estimate":len(guidelines.split()),"guidelines_preview":guidelines[:500]}
     except Exception as e:
         logging.getLogger("uvicorn.error").exception("Priming error")
@@ -185,7 +363,7 @@ async def chatgpt_guidelines():
 async def chatgpt_odia_to_desia(req: ChatGPTTranslateRequest):
     """Translate Odia to Desia using ChatGPT"""
     try:
-        translated = translate_odia_to_desia_chatgpt(req.text, model=req.model)
+        translated = await run_blocking(translate_odia_to_desia_chatgpt, req.text, model=req.model)
         return ChatGPTTranslateResponse(
             translated_text=translated,
             model=req.model,
@@ -201,7 +379,7 @@ async def chatgpt_odia_to_desia(req: ChatGPTTranslateRequest):
 async def chatgpt_desia_to_odia(req: ChatGPTTranslateRequest):
     """Translate Desia to Odia using ChatGPT"""
     try:
-        translated = translate_desia_to_odia_chatgpt(req.text, model=req.model)
+        translated = await run_blocking(translate_desia_to_odia_chatgpt, req.text, model=req.model)
         return ChatGPTTranslateResponse(
             translated_text=translated,
             model=req.model,
@@ -217,7 +395,7 @@ async def chatgpt_desia_to_odia(req: ChatGPTTranslateRequest):
 async def chatgpt_english_to_desia(req: ChatGPTTranslateRequest):
     """Translate English to Desia using ChatGPT"""
     try:
-        translated = translate_english_to_desia_chatgpt(req.text, model=req.model)
+        translated = await run_blocking(translate_english_to_desia_chatgpt, req.text, model=req.model)
         return ChatGPTTranslateResponse(
             translated_text=translated,
             model=req.model,
@@ -233,7 +411,7 @@ async def chatgpt_english_to_desia(req: ChatGPTTranslateRequest):
 async def chatgpt_desia_to_english(req: ChatGPTTranslateRequest):
     """Translate Desia to English using ChatGPT"""
     try:
-        translated = translate_desia_to_english_chatgpt(req.text, model=req.model)
+        translated = await run_blocking(translate_desia_to_english_chatgpt, req.text, model=req.model)
         return ChatGPTTranslateResponse(
             translated_text=translated,
             model=req.model,
@@ -1,69 +1,423 @@
 import os
+import time
+import logging
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from typing import Tuple
+from transformers.modeling_outputs import BaseModelOutput
+from .snapshot import is_snapshot, load_snapshot
+from typing import Dict, List, Optional, Tuple
 
 MODEL_NAME = os.getenv("NLLB_MODEL", "facebook/nllb-200-distilled-600M")
+NLLB_DRAFT_MODEL = os.getenv("NLLB_DRAFT_MODEL")
+NLLB_RESTRICT_VOCAB = os.getenv("NLLB_RESTRICT_VOCAB", "").lower() in ("1", "true", "yes")
+NLLB_REPLICAS = int(os.getenv("NLLB_REPLICAS", "0"))
+NLLB_THREADS_PER_REPLICA = int(os.getenv("NLLB_THREADS_PER_REPLICA", "0")) or None
+# In-process engine calls allowed at once without replicas: each generate()
+# already uses every core through torch's intra-op threads
+NLLB_LOCAL_CONCURRENCY = max(int(os.getenv("NLLB_LOCAL_CONCURRENCY", "1")), 1)
 _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-_tokenizer = None
-_model = None
-_lang_code_to_id = None
+_engine = None
+_engine_lock = threading.Lock()
+_replica_pool = None
+logger = logging.getLogger("uvicorn.error")
 
-def load_model() -> Tuple[AutoTokenizer, AutoModelForSeq2SeqLM]:
-    global _tokenizer, _model, _lang_code_to_id
-    if _tokenizer is None or _model is None:
-        _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        _model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
-        _model.to(_device)
-        # Get language code mapping from tokenizer's vocabulary
-        if hasattr(_tokenizer, 'lang_code_to_id'):
-            _lang_code_to_id = _tokenizer.lang_code_to_id
+def _load_pretrained(source: str) -> Tuple[AutoTokenizer, AutoModelForSeq2SeqLM]:
+    if is_snapshot(source):
+        return load_snapshot(source)
+    adapter_config = os.path.join(source, "adapter_config.json")
+    if not os.path.isfile(adapter_config):
+        return AutoTokenizer.from_pretrained(source), AutoModelForSeq2SeqLM.from_pretrained(source)
+    # LoRA/PEFT adapter directory: merge the adapter into its base model once
+    try:
+        from peft import AutoPeftModelForSeq2SeqLM, PeftConfig
+    except ImportError as e:
+        raise RuntimeError(f"{source} is a PEFT adapter; install `peft` to load it") from e
+    model = AutoPeftModelForSeq2SeqLM.from_pretrained(source).merge_and_unload()
+    tokenizer_source = source if os.path.isfile(os.path.join(source, "tokenizer_config.json")) \
+        else PeftConfig.from_pretrained(source).base_model_name_or_path
+    return AutoTokenizer.from_pretrained(tokenizer_source), model
+
+class TranslationEngine:
+    """NLLB tokenizer/model pair that is safe to share between threads.
+
+    The engine holds no per-request state: source and target languages are
+    passed to every call and turned into language-token ids explicitly, so the
+    tokenizer's `src_lang`/`tgt_lang` are never touched. Language-token ids are
+    resolved once, when the engine is built.
+
+    With a `draft_model` (a smaller seq2seq model sharing the tokenizer, e.g. a
+    layer-pruned snapshot) greedy translation can run as assisted generation:
+    the draft proposes several tokens and the main model verifies them in one
+    decoder pass, which yields the same tokens as plain greedy decoding.
+
+    With `restrict_vocab` the output projection is limited to the tokens of the
+    target's script for Odia and English targets (see `vocab.py`).
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, device: Optional[torch.device] = None,
+                 draft_model: Optional[str] = None, restrict_vocab: bool = False):
+        self.model_name = model_name
+        self.device = device or _device
+        self.tokenizer, self.model = _load_pretrained(model_name)
+        self.model.to(self.device)
+        self.model.eval()
+        self.lang_code_to_id = self._build_lang_code_map()
+        # Older NLLB tokenizers put the language token after </s> instead of first
+        self._legacy_prefix = bool(getattr(self.tokenizer, "legacy_behaviour", False))
+        self.draft_model = None
+        self._decoder_calls = threading.local()
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        self.vocab_head = None
+        if restrict_vocab:
+            self.enable_vocab_restriction()
+        if draft_model:
+            self._load_draft(draft_model)
+
+    def enable_vocab_restriction(self) -> None:
+        from .vocab import VocabRestrictedHead, build_target_vocabs
+
+        subsets = build_target_vocabs(self.tokenizer, self.lang_code_to_id)
+        self.vocab_head = VocabRestrictedHead(self.model.get_output_embeddings(), subsets)
+        self.model.set_output_embeddings(self.vocab_head)
+        logger.info("Restricted output vocabulary of %s: %s", self.model_name, self.vocab_head.describe())
+
+    def _target_vocab(self, target_langs: List[str]):
+        """Context restricting each batch item's logits to its target's vocabulary, if enabled."""
+        if self.vocab_head is None:
+            return contextlib.nullcontext()
+        return self.vocab_head.restrict(target_langs)
+
+    def _load_draft(self, source: str) -> None:
+        _, draft = _load_pretrained(source)
+        if draft.config.vocab_size != self.model.config.vocab_size:
+            raise ValueError(f"Draft model {source} does not share the vocabulary of {self.model_name}")
+        draft.to(self.device)
+        draft.eval()
+        self.draft_model = draft
+        # Decoder passes are counted only while a greedy call on this thread is
+        # being measured; the hooks exist only on engines that have a draft.
+        self.model.get_decoder().register_forward_hook(self._count_decoder_call("main"))
+        draft.get_decoder().register_forward_hook(self._count_decoder_call("draft"))
+
+    def _count_decoder_call(self, name: str):
+        def hook(module, args, output):
+            counts = getattr(self._decoder_calls, "counts", None)
+            if counts is not None:
+                counts[name] += 1
+        return hook
+
+    def _build_lang_code_map(self) -> Dict[str, int]:
+        tokenizer = self.tokenizer
+        mapping = dict(getattr(tokenizer, "lang_code_to_id", None) or {})
+        if not mapping:
+            # Newer tokenizers only list the language codes as special tokens
+            codes = [t for t in tokenizer.additional_special_tokens if "_" in t]
+            mapping = dict(zip(codes, tokenizer.convert_tokens_to_ids(codes)))
+        for code in SUPPORTED_CODES:
+            if code not in mapping:
+                mapping[code] = tokenizer.convert_tokens_to_ids(code)
+        return {code: i for code, i in mapping.items() if i != tokenizer.unk_token_id}
+
+    def get_forced_bos_id(self, lang_code: str) -> int:
+        try:
+            return self.lang_code_to_id[lang_code]
+        except KeyError:
+            raise ValueError(f"Unsupported language code: {lang_code}") from None
+
+    def encode(self, text: str, source_lang: str, max_length: int = 256) -> torch.Tensor:
+        """Token ids for `text` with the source-language prefix added explicitly."""
+        tokenizer = self.tokenizer
+        lang_id = self.get_forced_bos_id(source_lang)
+        # No truncation/padding arguments: those reconfigure the shared fast
+        # tokenizer backend on every call, which is not thread-safe.
+        ids = tokenizer.encode(text.strip(), add_special_tokens=False)[:max_length - 2]
+        if self._legacy_prefix:
+            ids = ids + [tokenizer.eos_token_id, lang_id]
         else:
-            # Build it from the tokenizer's vocabulary
-            _lang_code_to_id = {
-                code: _tokenizer.convert_tokens_to_ids(code)
-                for code in [ENGLISH_CODE, ODIA_CODE]
-            }
-    return _tokenizer, _model
+            ids = [lang_id] + ids + [tokenizer.eos_token_id]
+        return torch.tensor([ids], device=self.model.device)
+
+    @torch.inference_mode()
+    def translate(self, text: str, source_lang: str, target_lang: str, max_length: int = 256, num_beams: int = 5,
+                  speculative: bool = False) -> str:
+        """Translate `text`; `speculative=True` decodes greedily with the draft model's help."""
+        if speculative and self.draft_model is None:
+            raise ValueError("Speculative decoding needs a draft model (set NLLB_DRAFT_MODEL)")
+        forced_bos_token_id = self.get_forced_bos_id(target_lang)
+        input_ids = self.encode(text, source_lang, max_length)
+        extra = {"assistant_model": self.draft_model} if speculative else {}
+        measure = self.draft_model is not None and (speculative or num_beams == 1)
+        if measure:
+            self._decoder_calls.counts = {"main": 0, "draft": 0}
+            start = time.perf_counter()
+        try:
+            with self._target_vocab([target_lang]):
+                generated_tokens = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    forced_bos_token_id=forced_bos_token_id,
+                    num_beams=1 if speculative else num_beams,
+                    max_length=max_length,
+                    no_repeat_ngram_size=3,
+                    **extra
+                )
+        finally:
+            counts = getattr(self._decoder_calls, "counts", None)
+            self._decoder_calls.counts = None
+        if measure:
+            # Every generated position after the decoder start token is a new token
+            self._record_decode((source_lang, target_lang), speculative, generated_tokens.shape[1] - 1,
+                                time.perf_counter() - start, counts)
+        translated = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+        return translated.strip()
+
+    def _record_decode(self, pair: Tuple[str, str], speculative: bool, new_tokens: int, seconds: float,
+                       counts: Dict[str, int]) -> None:
+        mode = "speculative" if speculative else "greedy"
+        with self._stats_lock:
+            stats = self._stats.setdefault(pair, dict.fromkeys(
+                ["greedy_requests", "greedy_tokens", "greedy_seconds", "speculative_requests",
+                 "speculative_tokens", "speculative_seconds", "main_passes", "draft_passes"], 0))
+            stats[f"{mode}_requests"] += 1
+            stats[f"{mode}_tokens"] += new_tokens
+            stats[f"{mode}_seconds"] += seconds
+            if speculative:
+                stats["main_passes"] += counts["main"]
+                stats["draft_passes"] += counts["draft"]
+
+    def reset_speculative_stats(self) -> None:
+        with self._stats_lock:
+            self._stats.clear()
+
+    def speculative_stats(self) -> Dict[str, dict]:
+        """Acceptance rate and speedup over plain greedy decoding, per language pair.
+
+        Each main-model pass yields the draft tokens it accepted plus one of its
+        own, so accepted = tokens - main passes; every draft pass proposes one
+        token. Speedup compares time per token against greedy calls on the
+        same engine and is None until both modes have been used for the pair.
+        """
+        report = {}
+        with self._stats_lock:
+            for (source, target), s in self._stats.items():
+                spec_ms = 1000 * s["speculative_seconds"] / s["speculative_tokens"] if s["speculative_tokens"] else None
+                greedy_ms = 1000 * s["greedy_seconds"] / s["greedy_tokens"] if s["greedy_tokens"] else None
+                accepted = s["speculative_tokens"] - s["main_passes"]
+                report[f"{source}->{target}"] = {
+                    "speculative_requests": s["speculative_requests"],
+                    "greedy_requests": s["greedy_requests"],
+                    "acceptance_rate": round(accepted / s["draft_passes"], 3) if s["draft_passes"] else None,
+                    "tokens_per_main_pass": round(s["speculative_tokens"] / s["main_passes"], 2) if s["main_passes"] else None,
+                    "speculative_ms_per_token": round(spec_ms, 2) if spec_ms else None,
+                    "greedy_ms_per_token": round(greedy_ms, 2) if greedy_ms else None,
+                    "speedup": round(greedy_ms / spec_ms, 2) if spec_ms and greedy_ms else None,
+                }
+        return report
+
+    @torch.inference_mode()
+    def translate_multi(self, text: str, source_lang: str, target_langs: List[str], max_length: int = 256, num_beams: int = 5) -> Dict[str, str]:
+        """Translate one text into several target languages.
+
+        The source is tokenized and run through the encoder once; the encoder
+        output is shared by one batched decode whose rows start with each
+        target's language token (the same prefix `forced_bos_token_id` produces).
+        """
+        targets = list(dict.fromkeys(target_langs))
+        if not targets:
+            return {}
+        model = self.model
+        decoder_start = model.config.decoder_start_token_id
+        decoder_input_ids = torch.tensor(
+            [[decoder_start, self.get_forced_bos_id(lang)] for lang in targets],
+            device=model.device,
+        )
+        input_ids = self.encode(text, source_lang, max_length)
+        attention_mask = torch.ones_like(input_ids)
+        encoder_hidden = model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        batch = len(targets)
+        with self._target_vocab(targets):
+            generated_tokens = model.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=encoder_hidden.expand(batch, -1, -1)),
+                attention_mask=attention_mask.expand(batch, -1),
+                decoder_input_ids=decoder_input_ids,
+                num_beams=num_beams,
+                max_length=max_length,
+                no_repeat_ngram_size=3
+            )
+        translated = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+        return {lang: out.strip() for lang, out in zip(targets, translated)}
+
+
+def get_engine() -> TranslationEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TranslationEngine(MODEL_NAME, draft_model=NLLB_DRAFT_MODEL,
+                                            restrict_vocab=NLLB_RESTRICT_VOCAB)
+    return _engine
+
+def load_model() -> Tuple[AutoTokenizer, AutoModelForSeq2SeqLM]:
+    engine = get_engine()
+    return engine.tokenizer, engine.model
 
 def get_forced_bos_id(lang_code: str) -> int:
-    tokenizer, model = load_model()
-    if _lang_code_to_id and lang_code in _lang_code_to_id:
-        return _lang_code_to_id[lang_code]
-    # Fallback: use tokenizer's convert method
-    token_id = tokenizer.convert_tokens_to_ids(lang_code)
-    if token_id == tokenizer.unk_token_id:
-        raise ValueError(f"Unsupported language code: {lang_code}")
-    return token_id
+    return get_engine().get_forced_bos_id(lang_code)
 
 PROMPT_PREFIX = "Translate the following text, preserving proper names and punctuation. Output only the translation.\n"
 
-@torch.inference_mode()
-def translate(text: str, source_lang: str, target_lang: str, max_length: int = 256, num_beams: int = 5) -> str:
-    tokenizer, model = load_model()
-    # Ensure tokenizer encodes with correct source language
-    try:
-        tokenizer.src_lang = source_lang
-    except Exception:
-        pass
-    try:
-        tokenizer.tgt_lang = target_lang
-    except Exception:
-        pass
-    forced_bos_token_id = get_forced_bos_id(target_lang)
-    # Construct input text
-    prompt = text.strip()
-    inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=max_length)
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
-    generated_tokens = model.generate(
-        **inputs,
-        forced_bos_token_id=forced_bos_token_id,
-        num_beams=num_beams,
-        max_length=max_length,
-        no_repeat_ngram_size=3
-    )
-    translated = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
-    return translated.strip()
+def translate(text: str, source_lang: str, target_lang: str, max_length: int = 256, num_beams: int = 5,
+              speculative: bool = False) -> str:
+    return get_engine().translate(text, source_lang, target_lang, max_length, num_beams, speculative)
+
+def translate_multi(text: str, source_lang: str, target_langs: List[str], max_length: int = 256, num_beams: int = 5) -> Dict[str, str]:
+    return get_engine().translate_multi(text, source_lang, target_langs, max_length, num_beams)
+
+
+# ============ Core-partitioned replica pool ============
+
+def partition_cores(parts: int) -> List[List[int]]:
+    """Split the CPUs this process may run on into `parts` disjoint slices."""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if parts > len(cores):
+        # More parts than cores: share cores round-robin rather than fail
+        return [[cores[i % len(cores)]] for i in range(parts)]
+    size, extra = divmod(len(cores), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+def _init_replica(cores: List[int], threads: int, replicas: int) -> None:
+    from .registry import get_registry  # registry imports this module
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    get_registry().split_budget(replicas)
+
+def _call_engine(model_name: Optional[str], method: str, args: tuple, kwargs: dict):
+    from .registry import get_registry
+    return getattr(get_registry().get(model_name), method)(*args, **kwargs)
+
+def _list_models() -> List[dict]:
+    from .registry import get_registry
+    return get_registry().list_models()
+
+class ReplicaPool:
+    """Engine replicas in forked processes, each pinned to its own cores.
+
+    torch's intra-op thread pool is process-wide, so threads alone cannot give
+    each replica its own cores. Each replica is instead a single-worker process
+    forked after the parent has loaded the engine: weights are shared
+    copy-on-write, and the replica runs with its core slice as CPU affinity and
+    as its torch thread count. Calls go to the replica with the fewest pending
+    requests. A replica whose process dies (OOM kill, segfault) is replaced by
+    a fresh fork on the same cores; only the calls it was running fail.
+    """
+
+    def __init__(self, replicas: int, threads_per_replica: Optional[int] = None):
+        get_engine()
+        self._ctx = multiprocessing.get_context("fork")
+        self._lock = threading.Lock()
+        self._slices = [(cores, threads_per_replica or len(cores)) for cores in partition_cores(replicas)]
+        self._executors = []
+        self._pending = []
+        for index in range(len(self._slices)):
+            executor = self._new_executor(index)
+            # Fork now, while startup is still quiet, rather than on the first request
+            executor.submit(int).result()
+            self._executors.append(executor)
+            self._pending.append(0)
+
+    def _new_executor(self, index: int) -> ProcessPoolExecutor:
+        cores, threads = self._slices[index]
+        return ProcessPoolExecutor(1, mp_context=self._ctx, initializer=_init_replica,
+                                   initargs=(cores, threads, len(self._slices)))
+
+    def __len__(self) -> int:
+        return len(self._executors)
+
+    def submit(self, model_name: Optional[str], method: str, *args, **kwargs) -> Future:
+        """Run `<method>(*args, **kwargs)` of registry model `model_name` on the least-loaded replica.
+
+        The default model is shared with the parent; other models are loaded by
+        each replica's own registry on first use, within its share of the budget.
+        """
+        with self._lock:
+            index = min(range(len(self._executors)), key=self._pending.__getitem__)
+            self._pending[index] += 1
+            executor = self._executors[index]
+        try:
+            try:
+                future = executor.submit(_call_engine, model_name, method, args, kwargs)
+            except BrokenProcessPool:
+                executor = self._respawn(index, executor)
+                future = executor.submit(_call_engine, model_name, method, args, kwargs)
+        except BaseException:
+            self._release(index)
+            raise
+        future.add_done_callback(lambda f: self._done(index, executor, f))
+        return future
+
+    def list_models(self) -> List[List[dict]]:
+        """Every replica's own registry listing (see `registry.merge_listings`)."""
+        futures = []
+        for executor in list(self._executors):
+            try:
+                futures.append(executor.submit(_list_models))
+            except BrokenProcessPool:
+                continue
+        listings = []
+        for future in futures:
+            try:
+                listings.append(future.result())
+            except BrokenProcessPool:
+                continue
+        return listings
+
+    def _done(self, index: int, executor: ProcessPoolExecutor, future: Future) -> None:
+        self._release(index)
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._respawn(index, executor)
+
+    def _release(self, index: int) -> None:
+        with self._lock:
+            self._pending[index] -= 1
+
+    def _respawn(self, index: int, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Replace replica `index` if it is still the dead executor `broken`; returns the live one."""
+        with self._lock:
+            if self._executors[index] is broken:
+                logger.warning("NLLB replica %d died; forking a replacement", index)
+                broken.shutdown(wait=False)
+                # The new process forks lazily, on its first call
+                self._executors[index] = self._new_executor(index)
+            return self._executors[index]
+
+    def shutdown(self) -> None:
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def start_replica_pool(replicas: int = NLLB_REPLICAS, threads_per_replica: Optional[int] = NLLB_THREADS_PER_REPLICA) -> Optional[ReplicaPool]:
+    """Create the process-wide replica pool; returns None when `replicas` is 0."""
+    global _replica_pool
+    if _replica_pool is None and replicas > 0:
+        _replica_pool = ReplicaPool(replicas, threads_per_replica)
+    return _replica_pool
+
+def get_replica_pool() -> Optional[ReplicaPool]:
+    return _replica_pool
 
 ODIA_CODE = "ory_Orya"
 ENGLISH_CODE = "eng_Latn"
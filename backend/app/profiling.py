@@ -0,0 +1,164 @@
+"""Opt-in per-request profiling for the translation routes.
+
+Profiling is off unless ``PROFILE_DIR`` is set; when off, ``main.py`` does not
+install the middleware at all, so requests pay nothing for the feature.
+
+When on, a request is profiled if either:
+ - it carries ``X-Profile: cprofile|torch`` (or ``?profile=cprofile|torch``)
+   together with an ``X-Profile-Token`` header matching ``PROFILE_ADMIN_TOKEN``
+   (header only, so the token never shows up in access or proxy logs), or
+ - it is picked by sampling: every ``PROFILE_SAMPLE_EVERY``-th request to a
+   profiled route is run under ``PROFILE_MODE`` automatically.
+
+Traces are written to ``PROFILE_DIR``: ``.prof`` files for cProfile (open with
+``snakeviz`` or ``pstats``) and Chrome trace ``.json`` files for the torch
+profiler (open in ``chrome://tracing`` or Perfetto).
+
+The middleware never profiles the event loop itself: a profiled request's
+blocking work (NLLB ``generate``, ChatGPT calls) still runs in a worker thread,
+wrapped with ``profiled()``, and only that thread is traced. Other clients keep
+being served meanwhile and their coroutines stay out of the trace. (From
+Python 3.12 cProfile hooks every thread, so a trace may include other
+threads' calls that overlapped with the profiled one.)
+"""
+import os
+import hmac
+import functools
+import time
+import uuid
+import logging
+import cProfile
+import itertools
+import contextvars
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+
+PROFILING_ENABLED = bool(PROFILE_DIR)
+PROFILE_MODES = ("cprofile", "torch")
+PROFILED_PREFIXES = ("/api/translate", "/api/chatgpt/")
+
+_request_counter = itertools.count(1)
+# cProfile and the torch profiler are both process-wide hooks; only one
+# request is profiled at a time and concurrent candidates run unprofiled.
+_profile_lock = threading.Lock()
+
+# The trace of the request being handled, if it is profiled; its translation
+# work then runs in a local worker thread rather than on a replica.
+_current_trace = contextvars.ContextVar("profile_trace", default=None)
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def is_profiling() -> bool:
+    """True while handling a request that is running under a profiler."""
+    return _current_trace.get() is not None
+
+
+def profiled(fn: Callable) -> Callable:
+    """`fn`, wrapped to run under the current request's profiler if it has one.
+
+    Wrap on the event loop and call the result in a worker thread: the profiler
+    is enabled in whichever thread runs the wrapper, for that call only.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return trace.run(fn, *args, **kwargs)
+    return wrapper
+
+
+def _requested_mode(request) -> Optional[str]:
+    """Return the profiling mode asked for by an authorised request, if any."""
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not mode:
+        return None
+    token = request.headers.get("x-profile-token") or ""
+    if not PROFILE_ADMIN_TOKEN or not hmac.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        logger.warning("Ignoring profile flag on %s: missing or invalid admin token", request.url.path)
+        return None
+    mode = mode.lower()
+    return mode if mode in PROFILE_MODES else PROFILE_MODE
+
+
+def _sampled() -> bool:
+    return PROFILE_SAMPLE_EVERY > 0 and next(_request_counter) % PROFILE_SAMPLE_EVERY == 0
+
+
+def _trace_path(path: str, suffix: str) -> Path:
+    slug = path.strip("/").replace("/", "_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}{suffix}"
+    out_dir = Path(PROFILE_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return out_dir / name
+
+
+class _Trace:
+    """Profiler state of one request, filled in by the calls wrapped with `profiled`."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.cprofile = cProfile.Profile()
+        self.cprofile_calls = 0
+        self.torch_profiles = []
+
+    def run(self, fn: Callable, *args, **kwargs):
+        if self.mode == "torch":
+            import torch
+            from torch.profiler import profile, ProfilerActivity
+
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            with profile(activities=activities, record_shapes=True) as prof:
+                result = fn(*args, **kwargs)
+            self.torch_profiles.append(prof)
+            return result
+        self.cprofile_calls += 1
+        self.cprofile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.cprofile.disable()
+
+    def dump(self, path: str) -> List[Path]:
+        """Write the collected traces; one file per torch-profiled call."""
+        paths = []
+        if self.cprofile_calls:
+            paths.append(_trace_path(path, ".prof"))
+            self.cprofile.dump_stats(str(paths[-1]))
+        for prof in self.torch_profiles:
+            paths.append(_trace_path(path, ".json"))
+            prof.export_chrome_trace(str(paths[-1]))
+        return paths
+
+
+async def profile_middleware(request, call_next):
+    """HTTP middleware that profiles flagged or sampled translation requests."""
+    if not request.url.path.startswith(PROFILED_PREFIXES):
+        return await call_next(request)
+    mode = _requested_mode(request)
+    if mode is None and _sampled():
+        mode = PROFILE_MODE
+    if mode is None or not _profile_lock.acquire(blocking=False):
+        return await call_next(request)
+    trace = _Trace(mode)
+    token = _current_trace.set(trace)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_trace.reset(token)
+        _profile_lock.release()
+    paths = trace.dump(request.url.path)
+    if paths:
+        logger.info("Wrote %s profile for %s to %s", mode, request.url.path, ", ".join(map(str, paths)))
+        response.headers["X-Profile-Trace"] = ", ".join(p.name for p in paths)
+    return response
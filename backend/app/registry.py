@@ -0,0 +1,209 @@
+"""Registry of NLLB models that requests can pick by name.
+
+Models are listed in ``NLLB_MODELS`` as comma-separated ``name=source`` entries
+(or a bare ``source``, which is then also its name), where ``source`` is a
+Hugging Face id or a local directory:
+
+    NLLB_MODELS=nllb-1.3b=facebook/nllb-200-distilled-1.3B,desia-lora=/models/desia-lora
+
+The default model (``NLLB_MODEL``) is always available under its own name,
+is loaded through ``model.get_engine()`` and is never evicted. Other models load
+on first use and are evicted least-recently-used first whenever the resident
+size of all loaded models exceeds ``NLLB_MEMORY_BUDGET_MB`` (0 = no limit).
+Room is made before a model loads, from its size estimated on the meta device
+(``estimate_bytes``), so the budget also bounds the peak while loading.
+
+Each process has its own registry. With ``NLLB_REPLICAS`` the replicas load
+non-default models privately, so each replica gets an equal share of what the
+budget leaves after the shared default model (``split_budget``), and
+``merge_listings`` adds the replicas' listings to the parent's.
+"""
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import torch
+from transformers import AutoConfig, AutoModelForSeq2SeqLM
+
+from .model import MODEL_NAME, TranslationEngine, get_engine
+from .snapshot import SNAPSHOT_MARKER, is_snapshot
+
+NLLB_MODELS = os.getenv("NLLB_MODELS", "")
+NLLB_MEMORY_BUDGET_MB = int(os.getenv("NLLB_MEMORY_BUDGET_MB", "0"))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def parse_model_list(spec: str) -> Dict[str, str]:
+    models = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, source = entry.partition("=")
+        models[name.strip()] = source.strip() if sep else name.strip()
+    return models
+
+
+def resident_bytes(engine: TranslationEngine) -> int:
+    """Bytes held by the engine's parameters and buffers (tied weights counted once)."""
+    seen = set()
+    total = 0
+    tensors = list(engine.model.parameters()) + list(engine.model.buffers())
+    for t in tensors:
+        key = (t.device, t.data_ptr())
+        if key in seen:
+            continue
+        seen.add(key)
+        total += t.numel() * t.element_size()
+    return total
+
+
+def estimate_bytes(source: str) -> int:
+    """Bytes `source` will hold once loaded, from its config built on the meta device.
+
+    Nothing is allocated or downloaded beyond the config. Returns 0 if the
+    config cannot be read.
+    """
+    dtype = torch.float32
+    adapter_config = os.path.join(source, "adapter_config.json")
+    try:
+        if is_snapshot(source):
+            with open(os.path.join(source, SNAPSHOT_MARKER), encoding="utf-8") as f:
+                dtype = getattr(torch, json.load(f)["dtype"])
+        elif os.path.isfile(adapter_config):
+            # A merged LoRA adapter is the size of its base model
+            with open(adapter_config, encoding="utf-8") as f:
+                source = json.load(f)["base_model_name_or_path"]
+        config = AutoConfig.from_pretrained(source)
+        with torch.device("meta"):
+            model = AutoModelForSeq2SeqLM.from_config(config, torch_dtype=dtype)
+    except Exception as e:
+        logger.warning("Could not estimate the size of %s: %s", source, e)
+        return 0
+    # parameters() yields tied weights once
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+
+
+class ModelRegistry:
+    def __init__(self, models: Dict[str, str], default: str = MODEL_NAME, budget_bytes: int = 0):
+        self.default = default
+        self.models = {default: default, **models}
+        self.budget_bytes = budget_bytes
+        self._loaded: "OrderedDict[str, TranslationEngine]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.models}
+
+    def resolve(self, name: Optional[str]) -> str:
+        name = name or self.default
+        if name not in self.models:
+            raise ValueError(f"Unknown model: {name}. Available: {', '.join(self.models)}")
+        return name
+
+    def get(self, name: Optional[str] = None) -> TranslationEngine:
+        name = self.resolve(name)
+        engine = self._touch(name)
+        if engine is None:
+            # Load outside the registry lock so other models keep serving meanwhile
+            with self._load_locks[name]:
+                engine = self._touch(name) or self._load(name)
+        return engine
+
+    def _touch(self, name: str) -> Optional[TranslationEngine]:
+        with self._lock:
+            engine = self._loaded.get(name)
+            if engine is not None:
+                self._loaded.move_to_end(name)
+            return engine
+
+    def _load(self, name: str) -> TranslationEngine:
+        if self.budget_bytes and name != self.default:
+            # Make room first: evicting only after the load would let the
+            # peak exceed the budget by the whole new model
+            incoming = self._sizes.get(name) or estimate_bytes(self.models[name])
+            with self._lock:
+                self._evict(incoming, keep=name)
+        logger.info("Loading model %s from %s", name, self.models[name])
+        engine = get_engine() if name == self.default else TranslationEngine(self.models[name])
+        size = resident_bytes(engine)
+        with self._lock:
+            self._sizes[name] = size
+            self._loaded[name] = engine
+            self._evict(0, keep=name)
+        return engine
+
+    def _evict(self, incoming: int, keep: str) -> None:
+        """Drop least-recently-used models until `incoming` more bytes fit the budget."""
+        if not self.budget_bytes:
+            return
+        total = sum(self._sizes[n] for n in self._loaded) + incoming
+        for name in list(self._loaded):
+            if total <= self.budget_bytes:
+                break
+            if name in (keep, self.default):
+                continue
+            del self._loaded[name]
+            total -= self._sizes[name]
+            logger.info("Evicted model %s (%.0f MiB) to stay within the memory budget",
+                        name, self._sizes[name] / 2**20)
+        if total > self.budget_bytes:
+            logger.warning("Loaded models use %.0f MiB, over the %.0f MiB budget",
+                           total / 2**20, self.budget_bytes / 2**20)
+
+    def split_budget(self, parts: int) -> None:
+        """Shrink this process's budget to its share when `parts` processes load models privately.
+
+        The default model is shared copy-on-write with the parent, so it counts
+        once; what the budget leaves beyond it is split evenly between the parts.
+        """
+        if not self.budget_bytes or parts <= 1:
+            return
+        shared = resident_bytes(get_engine())
+        with self._lock:
+            self.budget_bytes = shared + max(self.budget_bytes - shared, 0) // parts
+
+    def list_models(self) -> List[dict]:
+        with self._lock:
+            loaded = set(self._loaded)
+            return [
+                {
+                    "name": name,
+                    "source": source,
+                    "default": name == self.default,
+                    "loaded": name in loaded,
+                    "resident_mb": round(self._sizes[name] / 2**20, 1) if name in loaded else None,
+                }
+                for name, source in self.models.items()
+            ]
+
+
+def merge_listings(parent: List[dict], replicas: List[List[dict]]) -> List[dict]:
+    """Combine the parent's `list_models()` with those of its replicas.
+
+    The default model is shared, so its size is counted once; other models are
+    private to every replica that loaded them, so their sizes add up.
+    """
+    merged = []
+    for entry in parent:
+        in_replicas = [e for listing in replicas for e in listing if e["name"] == entry["name"] and e["loaded"]]
+        sizes = [e["resident_mb"] for e in [entry] + in_replicas if e["loaded"]]
+        resident = (max(sizes) if entry["default"] else round(sum(sizes), 1)) if sizes else None
+        merged.append(dict(entry, loaded=bool(sizes), resident_mb=resident, replicas_loaded=len(in_replicas)))
+    return merged
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(parse_model_list(NLLB_MODELS), MODEL_NAME, NLLB_MEMORY_BUDGET_MB * 2**20)
+    return _registry
@@ -1,10 +1,13 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 class TranslateRequest(BaseModel):
     text: str = Field(..., min_length=1, description="Input text to translate")
     source_language: str = Field(..., description="Source language code e.g. eng_Latn")
     target_language: str = Field(..., description="Target language code e.g. ory_Orya")
+    model: Optional[str] = Field(default=None, description="Registry model name; defaults to NLLB_MODEL")
+    speculative: bool = Field(default=False, description="Greedy decoding assisted by the draft model (NLLB_DRAFT_MODEL)")
+    num_beams: int = Field(default=5, ge=1, le=8, description="Beam width; 1 is greedy decoding (ignored when speculative)")
 
 class TranslateResponse(BaseModel):
     translated_text: str
@@ -12,6 +15,36 @@ class TranslateResponse(BaseModel):
     source_language: str
     target_language: str
 
+class MultiTranslateRequest(BaseModel):
+    text: str = Field(..., min_length=1, description="Input text to translate")
+    source_language: str = Field(..., description="Source language code e.g. eng_Latn")
+    target_languages: List[str] = Field(..., min_length=1, description="Target codes e.g. [\"eng_Latn\", \"ory_Orya\", \"desia\"]")
+    model: Optional[str] = Field(default=None, description="Registry model name; defaults to NLLB_MODEL")
+    chatgpt_model: Optional[str] = Field(default="gpt-4o-mini", description="OpenAI model used for the Odia→Desia pivot")
+
+class MultiTranslateResponse(BaseModel):
+    translations: Dict[str, str]
+    model: str
+    source_language: str
+
+class DictionaryEntry(BaseModel):
+    id: int
+    odia: str
+    desia: str
+    category: str
+    frequency: int = Field(..., description="Corpus frequency used for ranking")
+    matched: Optional[str] = Field(default=None, description="Language the query matched: odia or desia")
+
+class DictionarySuggestResponse(BaseModel):
+    query: str
+    suggestions: List[DictionaryEntry]
+
+class DictionaryBrowseResponse(BaseModel):
+    entries: List[DictionaryEntry]
+    next_cursor: Optional[str] = Field(default=None, description="Pass as cursor to get the next page; null on the last page")
+    total: int
+    categories: List[str]
+
 class DetectRequest(BaseModel):
     text: str = Field(..., min_length=1)
 
@@ -0,0 +1,123 @@
+"""Pre-forking server that shares a single copy of the NLLB weights.
+
+``uvicorn --workers N`` spawns fresh interpreters, so every worker runs
+``load_model()`` and holds its own ~2.4 GB fp32 copy of NLLB-600M. This entry
+point instead loads the model once in the parent, binds the listening socket,
+and then forks the workers. Weight storages are never written during
+inference, so their pages stay shared copy-on-write between all workers.
+
+Each worker is pinned to its own slice of the CPUs available to the parent and
+runs torch with that many intra-op threads, so N workers do not oversubscribe
+the machine.
+
+Usage (from ``backend/``):
+    python -m app.serve --workers 4
+    python -m app.serve --workers 2 --threads-per-worker 4 --port 5002
+"""
+import os
+import gc
+import sys
+import signal
+import socket
+import logging
+import argparse
+from typing import List, Optional
+
+import torch
+import uvicorn
+
+from .model import load_model, partition_cores
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, cores: Optional[List[int]], threads: int, log_level: str) -> None:
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed by the parent; the intra-op setting is what matters
+        pass
+    config = uvicorn.Config("app.main:app", log_level=log_level)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def serve(host: str = "127.0.0.1", port: int = 5002, workers: int = 2,
+          threads_per_worker: Optional[int] = None, pin: bool = True,
+          log_level: str = "info") -> None:
+    # Keep the parent single-threaded: it only loads weights, and an idle
+    # intra-op pool in the parent is not usable after fork anyway.
+    torch.set_num_threads(1)
+    load_model()
+    # Import the app before forking so workers share the imported modules too
+    from . import main  # noqa: F401
+
+    # Move everything allocated so far into the permanent generation so the
+    # cyclic GC does not touch (and un-share) those pages in the workers.
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    slices = partition_cores(workers)
+    children = []
+    for i in range(workers):
+        cores = slices[i] if pin else None
+        threads = threads_per_worker or len(slices[i])
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(sock, cores, threads, log_level)
+            finally:
+                os._exit(0)
+        logger.info("Started worker %d (pid %d) on cores %s with %d torch threads",
+                    i, pid, cores if cores else "all", threads)
+        children.append(pid)
+
+    def _shutdown(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with NLLB weights shared across forked workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5002")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("NLLB_WORKERS", "2")))
+    parser.add_argument("--threads-per-worker", type=int,
+                        default=int(os.getenv("NLLB_THREADS_PER_WORKER", "0")) or None,
+                        help="torch intra-op threads per worker (default: size of its core slice)")
+    parser.add_argument("--no-pin", action="store_true", help="do not pin workers to disjoint cores")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    if not hasattr(os, "fork"):
+        sys.exit("app.serve requires os.fork(); use `uvicorn app.main:app` on this platform")
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.workers, args.threads_per_worker, not args.no_pin, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Local NLLB snapshots that load by memory-mapping instead of copying.
+
+``from_pretrained`` resolves the Hugging Face cache, converts the checkpoint and
+copies every weight into process memory. A snapshot is written once with
+
+    python -m app.snapshot /models/nllb-600m                      # from NLLB_MODEL
+    python -m app.snapshot /models/nllb-600m-bf16 --dtype bfloat16
+    python -m app.snapshot /models/nllb-draft --decoder-layers 3   # draft model
+
+and holds the tokenizer, the model config, a single ``model.safetensors`` (in
+the chosen dtype, tied weights stored once) and a ``snapshot.json`` marker.
+Pointing ``NLLB_MODEL`` (or an ``NLLB_MODELS`` entry) at the directory makes
+``load_model()`` map that file privately and copy-on-write: loading takes
+near-constant time, pages are read lazily on first use, and all processes
+serving the same snapshot share them through the OS page cache.
+"""
+import os
+import json
+import struct
+import argparse
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSeq2SeqLM
+
+SNAPSHOT_MARKER = "snapshot.json"
+WEIGHTS_FILE = "model.safetensors"
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def is_snapshot(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, SNAPSHOT_MARKER))
+
+
+def write_snapshot(source: str, out_dir: str, dtype: str = "float32", decoder_layers: Optional[int] = None) -> Path:
+    """Convert `source` (hub id or directory) into a snapshot directory.
+
+    `decoder_layers` keeps only that many evenly spaced decoder layers, giving a
+    layer-pruned draft model for speculative decoding (NLLB_DRAFT_MODEL).
+    """
+    from safetensors.torch import save_file
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSeq2SeqLM.from_pretrained(source, torch_dtype=getattr(torch, dtype))
+    if decoder_layers:
+        decoder = model.get_decoder()
+        last = len(decoder.layers) - 1
+        keep = sorted({round(i * last / max(decoder_layers - 1, 1)) for i in range(decoder_layers)})
+        decoder.layers = torch.nn.ModuleList(decoder.layers[i] for i in keep)
+        model.config.decoder_layers = len(keep)
+    tokenizer.save_pretrained(out)
+    model.config.save_pretrained(out)
+
+    # Tied weights (shared embeddings / lm_head) are stored once and aliased on load
+    tensors, aliases, owners = {}, {}, {}
+    for key, tensor in model.state_dict().items():
+        ptr = tensor.data_ptr()
+        if ptr in owners and tensor.shape == tensors[owners[ptr]].shape:
+            aliases[key] = owners[ptr]
+            continue
+        owners[ptr] = key
+        tensors[key] = tensor.contiguous()
+    # Non-persistent buffers (NLLB's sinusoidal positions) are not in the state
+    # dict, and a model built on the meta device has no values for them
+    saved = set(model.state_dict())
+    buffers = [name for name, _ in model.named_buffers() if name not in saved]
+    for name, buffer in model.named_buffers():
+        if name in buffers:
+            tensors[name] = buffer.contiguous()
+    save_file(tensors, str(out / WEIGHTS_FILE), metadata={"format": "pt"})
+    with open(out / SNAPSHOT_MARKER, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "dtype": dtype, "decoder_layers": model.config.decoder_layers,
+                   "aliases": aliases, "buffers": buffers}, f, indent=2)
+    return out
+
+
+def _mmap_safetensors(path: Path) -> Dict[str, torch.Tensor]:
+    """Tensors of a safetensors file as views into one private file mapping."""
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+    data_start = 8 + header_len
+    storage = torch.UntypedStorage.from_file(str(path), shared=False, nbytes=path.stat().st_size)
+    flat = torch.empty(0, dtype=torch.uint8).set_(storage)
+    tensors = {}
+    for key, info in header.items():
+        if key == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        raw = flat[data_start + start:data_start + end]
+        if (data_start + start) % torch.empty(0, dtype=dtype).element_size():
+            # Misaligned for this dtype: this one tensor has to be copied
+            raw = raw.clone()
+        tensors[key] = raw.view(dtype).view(info["shape"])
+    return tensors
+
+
+def load_snapshot(path: str) -> Tuple[AutoTokenizer, AutoModelForSeq2SeqLM]:
+    root = Path(path)
+    with open(root / SNAPSHOT_MARKER, encoding="utf-8") as f:
+        meta = json.load(f)
+    tokenizer = AutoTokenizer.from_pretrained(root)
+    config = AutoConfig.from_pretrained(root)
+    # Built on the meta device: no memory is allocated or initialized, and
+    # every tensor is then replaced by a view into the mapped file.
+    with torch.device("meta"):
+        model = AutoModelForSeq2SeqLM.from_config(config, torch_dtype=getattr(torch, meta["dtype"]))
+    state_dict = _mmap_safetensors(root / WEIGHTS_FILE)
+    buffers = {name: state_dict.pop(name) for name in meta.get("buffers", [])}
+    for alias, owner in meta.get("aliases", {}).items():
+        state_dict[alias] = state_dict[owner]
+    model.load_state_dict(state_dict, assign=True)
+    for name, tensor in buffers.items():
+        module, _, attr = name.rpartition(".")
+        model.get_submodule(module).register_buffer(attr, tensor, persistent=False)
+    missing = [name for name, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise ValueError(f"Snapshot {path} has no values for {', '.join(missing[:5])}; "
+                         f"rewrite it with `python -m app.snapshot`")
+    model.eval()
+    return tokenizer, model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a memory-mappable NLLB snapshot")
+    parser.add_argument("out_dir", help="directory to write the snapshot to")
+    parser.add_argument("--model", default=os.getenv("NLLB_MODEL", "facebook/nllb-200-distilled-600M"),
+                        help="hub id or local directory to convert (default: NLLB_MODEL)")
+    parser.add_argument("--dtype", choices=["float32", "bfloat16", "float16"], default="float32",
+                        help="weight dtype stored in the snapshot")
+    parser.add_argument("--decoder-layers", type=int, default=None,
+                        help="keep only this many decoder layers (layer-pruned draft model)")
+    args = parser.parse_args(argv)
+    out = write_snapshot(args.model, args.out_dir, args.dtype, args.decoder_layers)
+    print(f"Wrote snapshot of {args.model} ({args.dtype}) to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Target-script vocabulary restriction for NLLB's output projection.
+
+NLLB projects every decoder state onto its full ~256k-token vocabulary, but we
+only ever decode into Odia (``ory_Orya``) or English (``eng_Latn``). For each
+target this module builds the subset of token ids that can occur in that
+script: tokens seen when tokenizing our Odia-script corpora, every vocabulary
+piece made only of the target script's characters (plus digits and
+punctuation), the target language token and the non-language special tokens.
+
+``VocabRestrictedHead`` replaces the model's ``lm_head``. While a restriction
+is active it multiplies the decoder state with the pre-sliced rows of the
+output matrix only, and scatters the result into a full-size logits tensor
+whose other entries are ``-inf``. Token ids therefore stay in the full
+vocabulary, so ``generate``'s logits processors and the tokenizer work
+unchanged, while each decoding step reads a fraction of the 256k x d weight.
+
+This trades memory for per-step compute rather than saving memory. The sliced
+rows are a private copy next to the (tied) full matrix, one per target, built
+once before any replica forks (``extra_bytes`` reports the total). Every step
+also still allocates full-vocabulary logits. A fan-out batch restricts
+each row to its own target, so no copy is made for target combinations.
+"""
+import re
+import csv
+import threading
+import contextlib
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'train' / 'data'
+SPACE_PIECE = "▁"
+# NLLB language tokens look like "eng_Latn"; they must not pass as Latin words
+LANGUAGE_TOKEN = re.compile(r"^[a-z]{3}_[A-Z][a-z]{3}$")
+# Per-target buffers of VocabRestrictedHead, registered as "<name>_<lang code>"
+ROW_BUFFERS = ("ids", "weight", "bias")
+
+
+def _is_common(ch: str) -> bool:
+    # Word-boundary marker, ASCII digits/punctuation/space and the dandas
+    return ch == SPACE_PIECE or (ord(ch) < 128 and not ch.isalpha()) or ch in "।॥"
+
+
+def _is_odia(ch: str) -> bool:
+    return 0x0B00 <= ord(ch) <= 0x0B7F or ch in "\u200c\u200d" or _is_common(ch)
+
+
+def _is_latin(ch: str) -> bool:
+    # Basic Latin through Latin Extended-B, plus general punctuation (quotes, dashes)
+    return ord(ch) < 0x0250 or 0x2000 <= ord(ch) <= 0x206F or ch == SPACE_PIECE
+
+
+SCRIPT_CHARS: Dict[str, Callable[[str], bool]] = {
+    "ory_Orya": _is_odia,
+    "eng_Latn": _is_latin,
+}
+
+
+def corpus_texts(lang_code: str) -> List[str]:
+    """Texts from train/data in the target's script (all of it is Odia script)."""
+    if lang_code != "ory_Orya":
+        return []
+    texts = []
+    for name, columns in (("dict.csv", ("odia_word", "desia_word")),
+                          ("merged_texts_corrected.csv", ("odia_word", "desia_word", "desia_sentence"))):
+        path = DATA_DIR / name
+        if not path.exists():
+            continue
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                texts.extend(row[c].strip() for c in columns if (row.get(c) or "").strip())
+    return texts
+
+
+def build_target_vocab(tokenizer, lang_code: str, lang_id: int, texts: Iterable[str] = ()) -> List[int]:
+    """Sorted token ids allowed when decoding into `lang_code`."""
+    in_script = SCRIPT_CHARS[lang_code]
+    special = {tokenizer.bos_token_id, tokenizer.eos_token_id, tokenizer.pad_token_id, tokenizer.unk_token_id}
+    ids = {i for i in special if i is not None}
+    ids.add(lang_id)
+    for text in texts:
+        ids.update(tokenizer.encode(text, add_special_tokens=False))
+    for piece, token_id in tokenizer.get_vocab().items():
+        # The bare word-boundary piece stays: no corpus adds it back for eng_Latn
+        if not piece or LANGUAGE_TOKEN.match(piece):
+            continue
+        if all(in_script(ch) for ch in piece):
+            ids.add(token_id)
+    return sorted(ids)
+
+
+def build_target_vocabs(tokenizer, lang_code_to_id: Dict[str, int]) -> Dict[str, List[int]]:
+    return {
+        code: build_target_vocab(tokenizer, code, lang_code_to_id[code], corpus_texts(code))
+        for code in SCRIPT_CHARS if code in lang_code_to_id
+    }
+
+
+class VocabRestrictedHead(nn.Module):
+    """Drop-in `lm_head` that computes logits only for the active target vocabularies."""
+
+    def __init__(self, head: nn.Linear, subsets: Dict[str, List[int]]):
+        super().__init__()
+        self.full = head
+        self.vocab_size = head.weight.shape[0]
+        self.subsets = {code: torch.tensor(ids, device=head.weight.device) for code, ids in subsets.items()}
+        with torch.no_grad():
+            for code, ids in self.subsets.items():
+                rows = (ids, head.weight[ids].contiguous(), head.bias[ids] if head.bias is not None else None)
+                # Registered (not saved) so model.buffers(), and with it the
+                # registry's resident size, accounts for the copies
+                for name, tensor in zip(ROW_BUFFERS, rows):
+                    self.register_buffer(f"{name}_{code}", tensor, persistent=False)
+        # The restriction is per calling thread so one engine can serve
+        # requests for different targets concurrently.
+        self._active = threading.local()
+
+    @property
+    def weight(self) -> torch.Tensor:
+        return self.full.weight
+
+    def _rows(self, code: str) -> Optional[tuple]:
+        if code not in self.subsets:
+            return None
+        return tuple(getattr(self, f"{name}_{code}") for name in ROW_BUFFERS)
+
+    @property
+    def extra_bytes(self) -> int:
+        """Memory held by the sliced rows, on top of the full output matrix."""
+        return sum(t.numel() * t.element_size() for t in self.buffers(recurse=False))
+
+    def describe(self) -> str:
+        sizes = ", ".join(f"{code}={len(ids)}" for code, ids in self.subsets.items())
+        return f"{sizes} of {self.vocab_size} tokens, {self.extra_bytes / 2**20:.0f} MiB of sliced output rows"
+
+    @contextlib.contextmanager
+    def restrict(self, lang_codes: Sequence[str]):
+        """Restrict logits on this thread to one target vocabulary per batch item.
+
+        The decoder batch is split evenly between `lang_codes`, in order, which
+        is how ``generate`` lays out beams. Targets without a prebuilt
+        vocabulary get the full projection.
+        """
+        previous = getattr(self._active, "rows", None)
+        rows = [self._rows(code) for code in lang_codes]
+        self._active.rows = rows if any(r is not None for r in rows) else None
+        try:
+            yield
+        finally:
+            self._active.rows = previous
+
+    def forward(self, hidden: torch.Tensor) -> torch.Tensor:
+        targets = getattr(self._active, "rows", None)
+        if targets is None:
+            return self.full(hidden)
+        if hidden.shape[0] % len(targets):
+            raise ValueError(f"Batch of {hidden.shape[0]} does not split between {len(targets)} targets")
+        group = hidden.shape[0] // len(targets)
+        logits = hidden.new_full((*hidden.shape[:-1], self.vocab_size), float("-inf"))
+        for i, rows in enumerate(targets):
+            part = slice(i * group, (i + 1) * group)
+            if rows is None:
+                logits[part] = self.full(hidden[part])
+            else:
+                ids, weight, bias = rows
+                logits[part].index_copy_(-1, ids, F.linear(hidden[part], weight, bias))
+        return logits
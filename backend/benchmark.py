@@ -0,0 +1,258 @@
+"""Benchmarks for the NLLB serving path.
+
+Subcommands:
+ - serve: start the API in a given serving mode, warm every worker, then report
+   per-process RSS/PSS and aggregate translation throughput.
+     python benchmark.py serve --mode prefork --workers 4
+     python benchmark.py serve --mode uvicorn --workers 4
+ - load: cold-start time of from_pretrained vs. a memory-mapped snapshot
+   (see app/snapshot.py), each trial in a fresh interpreter.
+     python benchmark.py load --snapshot /models/nllb-600m
+ - speculative: greedy vs. draft-assisted decoding per language pair: output
+   parity, draft acceptance rate and speedup.
+     python benchmark.py speculative --draft /models/nllb-draft
+ - vocab: parity report of target-script vocabulary restriction against the
+   full vocabulary (exact matches, similarity, time per request).
+     python benchmark.py vocab --samples 200 --out vocab_parity.jsonl
+
+PSS (proportional set size) splits shared pages between the processes that map
+them, so the PSS total is the real memory cost of a mode; RSS counts shared
+weights once per worker and overstates the prefork mode.
+
+Run from ``backend/``. Sample inputs come from train/data/merged_texts_corrected.csv.
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+import subprocess
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+DATA_DIR = Path(__file__).parent / 'train' / 'data'
+ODIA_CODE = "ory_Orya"
+ENGLISH_CODE = "eng_Latn"
+
+
+def load_sample_texts(limit: int):
+    df = pd.read_csv(DATA_DIR / 'merged_texts_corrected.csv', encoding='utf-8-sig')
+    texts = [str(t).strip() for t in df['desia_sentence'].dropna() if str(t).strip()]
+    return texts[:limit]
+
+
+def descendants(pid: int):
+    """PIDs of all live descendants of ``pid`` (Linux /proc scan)."""
+    parents = {}
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+        except OSError:
+            continue
+        # Field 4 is the ppid; the command name (field 2) may contain spaces
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        parents.setdefault(ppid, []).append(int(entry.name))
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def memory_mb(pid: int):
+    """(RSS, PSS) of a process in MiB, read from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1]) / 1024
+    return values.get('Rss:', 0.0), values.get('Pss:', 0.0)
+
+
+def post_json(url: str, payload: dict, timeout: float = 300):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def wait_for_health(base: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base}/api/health', timeout=2):
+                return
+        except OSError:
+            time.sleep(1)
+    raise TimeoutError(f'Server at {base} did not become healthy in {timeout}s')
+
+
+def start_server(mode: str, workers: int, port: int):
+    if mode == 'prefork':
+        cmd = [sys.executable, '-m', 'app.serve', '--workers', str(workers),
+               '--port', str(port), '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'app.main:app', '--workers', str(workers),
+               '--port', str(port), '--log-level', 'warning']
+    return subprocess.Popen(cmd, cwd=Path(__file__).parent)
+
+
+def bench_serve(args):
+    base = f'http://127.0.0.1:{args.port}'
+    texts = load_sample_texts(args.requests)
+    payload = lambda t: {'text': t, 'source_language': ODIA_CODE, 'target_language': ENGLISH_CODE}
+    proc = start_server(args.mode, args.workers, args.port)
+    try:
+        wait_for_health(base, args.startup_timeout)
+        # Warm up: enough concurrent requests that every worker loads/touches the model
+        with ThreadPoolExecutor(args.workers * 2) as pool:
+            list(pool.map(lambda t: post_json(f'{base}/api/translate', payload(t)), texts[:args.workers * 4]))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda t: post_json(f'{base}/api/translate', payload(t)), texts))
+        elapsed = time.perf_counter() - start
+
+        pids = [proc.pid] + descendants(proc.pid)
+        print(f'mode={args.mode} workers={args.workers} concurrency={args.concurrency}')
+        print(f'{"pid":>8} {"RSS MiB":>10} {"PSS MiB":>10}')
+        total_pss = 0.0
+        for pid in pids:
+            try:
+                rss, pss = memory_mb(pid)
+            except OSError:
+                continue
+            total_pss += pss
+            print(f'{pid:>8} {rss:>10.0f} {pss:>10.0f}')
+        print(f'total PSS: {total_pss:.0f} MiB')
+        print(f'throughput: {len(texts) / elapsed:.2f} req/s ({len(texts)} requests in {elapsed:.1f}s)')
+    finally:
+        proc.terminate()
+        proc.wait(timeout=60)
+
+
+LOAD_TRIAL = """
+import sys, time
+from app.model import _load_pretrained
+start = time.perf_counter()
+tokenizer, model = _load_pretrained(sys.argv[1])
+loaded = time.perf_counter() - start
+ids = tokenizer("Hello", return_tensors="pt").input_ids
+model.generate(input_ids=ids, max_length=8)
+print(f"{loaded:.3f} {time.perf_counter() - start:.3f}")
+"""
+
+
+def bench_load(args):
+    sources = [('from_pretrained', args.model), ('snapshot', args.snapshot)]
+    print(f'{"loader":<16} {"trial":>5} {"load s":>8} {"load+1st generate s":>20}')
+    for label, source in sources:
+        for trial in range(1, args.trials + 1):
+            out = subprocess.run([sys.executable, '-c', LOAD_TRIAL, source], cwd=Path(__file__).parent,
+                                 capture_output=True, text=True, check=True)
+            loaded, first = out.stdout.split()[-2:]
+            print(f'{label:<16} {trial:>5} {float(loaded):>8.2f} {float(first):>20.2f}')
+    print('Trial 1 may include reading the files from disk; later trials show page-cache-warm loads.')
+
+
+def bench_speculative(args):
+    from app.model import TranslationEngine
+
+    engine = TranslationEngine(args.model, draft_model=args.draft)
+    odia = load_sample_texts(args.samples)
+    # No English corpus ships with the repo: English inputs are greedy translations of the Odia-script samples
+    english = [engine.translate(t, ODIA_CODE, ENGLISH_CODE, num_beams=1) for t in odia]
+    engine.reset_speculative_stats()
+    mismatches = {}
+    for source, target, texts in [(ODIA_CODE, ENGLISH_CODE, odia), (ENGLISH_CODE, ODIA_CODE, english)]:
+        mismatches[f'{source}->{target}'] = sum(
+            engine.translate(t, source, target, num_beams=1) != engine.translate(t, source, target, speculative=True)
+            for t in texts
+        )
+    print(f'{"pair":<20} {"samples":>7} {"mismatch":>8} {"accept":>7} {"tok/pass":>8} '
+          f'{"greedy ms/tok":>13} {"spec ms/tok":>11} {"speedup":>7}')
+    for pair, r in engine.speculative_stats().items():
+        print(f'{pair:<20} {r["speculative_requests"]:>7} {mismatches.get(pair, 0):>8} '
+              f'{r["acceptance_rate"] or 0:>7.2f} {r["tokens_per_main_pass"] or 0:>8.2f} '
+              f'{r["greedy_ms_per_token"] or 0:>13.2f} {r["speculative_ms_per_token"] or 0:>11.2f} {r["speedup"] or 0:>7.2f}')
+
+
+def bench_vocab(args):
+    from app.model import TranslationEngine
+
+    engine = TranslationEngine(args.model, restrict_vocab=True)
+    head = engine.vocab_head
+    print(f'target vocabularies: {head.describe()}')
+
+    def run(texts, source, target, restricted):
+        engine.vocab_head = head if restricted else None
+        start = time.perf_counter()
+        outputs = [engine.translate(t, source, target, num_beams=args.beams) for t in texts]
+        return outputs, (time.perf_counter() - start) / max(len(texts), 1)
+
+    odia = load_sample_texts(args.samples)
+    english, _ = run(odia, ODIA_CODE, ENGLISH_CODE, restricted=False)
+    report = open(args.out, 'w', encoding='utf-8') if args.out else None
+    print(f'{"pair":<20} {"samples":>7} {"exact":>7} {"similarity":>10} {"full ms":>8} {"restricted ms":>13}')
+    for source, target, texts in [(ODIA_CODE, ENGLISH_CODE, odia), (ENGLISH_CODE, ODIA_CODE, english)]:
+        full, full_s = run(texts, source, target, restricted=False)
+        restricted, restricted_s = run(texts, source, target, restricted=True)
+        exact = sum(a == b for a, b in zip(full, restricted))
+        similarity = sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(full, restricted))
+        print(f'{source + "->" + target:<20} {len(texts):>7} {exact / len(texts):>7.1%} '
+              f'{similarity / len(texts):>10.3f} {full_s * 1000:>8.0f} {restricted_s * 1000:>13.0f}')
+        if report:
+            for text, a, b in zip(texts, full, restricted):
+                report.write(json.dumps({'source_language': source, 'target_language': target, 'text': text,
+                                         'full': a, 'restricted': b, 'match': a == b}, ensure_ascii=False) + '\n')
+    if report:
+        report.close()
+        print(f'Wrote per-sample results to {args.out}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='memory and throughput of a serving mode')
+    p.add_argument('--mode', choices=['prefork', 'uvicorn'], default='prefork')
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--requests', type=int, default=200)
+    p.add_argument('--port', type=int, default=5102)
+    p.add_argument('--startup-timeout', type=float, default=600)
+    p.set_defaults(func=bench_serve)
+
+    p = sub.add_parser('load', help='model load time: from_pretrained vs. snapshot')
+    p.add_argument('--snapshot', required=True, help='directory written by `python -m app.snapshot`')
+    p.add_argument('--model', default=os.getenv('NLLB_MODEL', 'facebook/nllb-200-distilled-600M'))
+    p.add_argument('--trials', type=int, default=3)
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser('speculative', help='greedy vs. draft-assisted decoding')
+    p.add_argument('--draft', required=True, help='draft model (hub id, directory or snapshot)')
+    p.add_argument('--model', default=os.getenv('NLLB_MODEL', 'facebook/nllb-200-distilled-600M'))
+    p.add_argument('--samples', type=int, default=50)
+    p.set_defaults(func=bench_speculative)
+
+    p = sub.add_parser('vocab', help='target-script vocabulary restriction parity')
+    p.add_argument('--model', default=os.getenv('NLLB_MODEL', 'facebook/nllb-200-distilled-600M'))
+    p.add_argument('--samples', type=int, default=200)
+    p.add_argument('--beams', type=int, default=5)
+    p.add_argument('--out', help='optional JSONL file with every full/restricted output pair')
+    p.set_defaults(func=bench_vocab)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""DictionaryIndex suggest/browse on a small in-memory dictionary."""
+from collections import Counter
+
+from app.dictionary import DictionaryIndex, get_dictionary, split_forms
+
+
+def make_index(rows, frequencies=()):
+    entries = [
+        {"id": i, "odia": odia, "desia": desia, "category": category,
+         "_forms": {"odia": split_forms(odia), "desia": split_forms(desia)}}
+        for i, (odia, desia, category) in enumerate(rows)
+    ]
+    return DictionaryIndex(entries, Counter(dict(frequencies)))
+
+
+INDEX_ROWS = [
+    ("ଘର", "ଘର", "house"),          # both forms match "ଘ"
+    ("ଘୋଡା", "ଗୁଡା", "animal"),      # only the Odia form matches "ଘ"
+    ("ପାଣି", "ଘାଣି", "water"),       # only the Desia form matches "ଘ"
+    ("ଗଛ", "ଗଛ", "plant"),
+    ("ଗାଈ", "ଗାଈ", "animal"),
+]
+
+
+def test_matched_reports_the_language_whose_form_matched():
+    index = make_index(INDEX_ROWS)
+    matched = {r["odia"]: r["matched"] for r in index.suggest("ଘ")}
+    # When both forms match, Odia wins
+    assert matched == {"ଘର": "odia", "ଘୋଡା": "odia", "ପାଣି": "desia"}
+    assert {r["odia"] for r in index.suggest("ଘ", lang="desia")} == {"ଘର", "ପାଣି"}
+    assert all(r["matched"] == "desia" for r in index.suggest("ଘ", lang="desia"))
+
+
+def test_matched_on_the_shipped_dictionary():
+    first = get_dictionary().suggest("ଅବ")[0]
+    assert (first["odia"], first["matched"]) == ("ଅବସ୍ଥିତ", "odia")
+
+
+def test_suggestions_are_ranked_by_frequency_and_filtered_by_category():
+    index = make_index(INDEX_ROWS, {"ଗାଈ": 10, "ଗଛ": 2})
+    assert [r["odia"] for r in index.suggest("ଗ")] == ["ଗାଈ", "ଗଛ", "ଘୋଡା"]
+    assert [r["odia"] for r in index.suggest("ଗ", category="animal")] == ["ଗାଈ", "ଘୋଡା"]
+    assert index.suggest("ଗ", limit=1)[0]["odia"] == "ଗାଈ"
+
+
+def test_browse_pages_with_cursor():
+    index = make_index(INDEX_ROWS)
+    page, cursor, total = index.browse(limit=2)
+    assert [e["id"] for e in page] == [0, 1] and cursor == "2" and total == 5
+    page, cursor, _ = index.browse(cursor=cursor, limit=2)
+    assert [e["id"] for e in page] == [2, 3] and cursor == "4"
+    page, cursor, _ = index.browse(cursor=cursor, limit=2)
+    assert [e["id"] for e in page] == [4] and cursor is None
+
+
+def test_browse_within_category():
+    index = make_index(INDEX_ROWS)
+    page, cursor, total = index.browse(category="animal", limit=1)
+    assert [e["id"] for e in page] == [1] and cursor == "4" and total == 2
+    page, cursor, _ = index.browse(category="animal", cursor=cursor, limit=1)
+    assert [e["id"] for e in page] == [4] and cursor is None
@@ -0,0 +1,77 @@
+"""LiveTranslationSession with a fake translator: no model or torch needed."""
+import asyncio
+
+from app.live import LiveTranslationSession
+
+LANGUAGES = {"source_language": "eng_Latn", "target_language": "ory_Orya"}
+
+
+class FakeTranslator:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = []
+        self.cancelled = []
+
+    async def __call__(self, model, method, text, source, target):
+        self.calls.append(text)
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        return text.upper()
+
+
+async def type_messages(texts, interval, translate_seconds):
+    """Send `texts` as consecutive edits; returns the translator and every reply."""
+    translator, sent = FakeTranslator(translate_seconds), []
+
+    async def send(message):
+        sent.append(message)
+
+    session = LiveTranslationSession(translator, send)
+    for seq, text in enumerate(texts):
+        session.submit({"seq": seq, "text": text, **LANGUAGES})
+        await asyncio.sleep(interval)
+    last = len(texts) - 1
+    while not any(m["type"] == "done" and m["seq"] == last for m in sent):
+        await asyncio.sleep(0.01)
+    session.close()
+    return translator, sent
+
+
+def test_keystroke_burst_runs_at_most_two_model_calls():
+    burst = ["How are you doing"] + ["How are you doing " + "today"[:n] for n in range(1, 6)] + ["How are you doing today"]
+    translator, sent = asyncio.run(type_messages(burst, interval=0.02, translate_seconds=0.2))
+    # The call already running when the burst started, then one for the final text
+    assert translator.calls == ["How are you doing", "How are you doing today"]
+    final = [m for m in sent if m["seq"] == len(burst) - 1]
+    assert final[0]["translation"] == "HOW ARE YOU DOING TODAY"
+    assert final[-1] == {"type": "done", "seq": len(burst) - 1, "count": 1, "translated": 1}
+
+
+def test_finished_sentences_are_not_retranslated():
+    texts = ["Hello there. How", "Hello there. How are you?"]
+    translator, sent = asyncio.run(type_messages(texts, interval=0.1, translate_seconds=0.01))
+    assert translator.calls == ["Hello there.", "How", "How are you?"]
+    second = [m for m in sent if m["seq"] == 1]
+    assert [m["index"] for m in second if m["type"] == "sentence"] == [1]
+    assert second[-1]["translated"] == 1
+
+
+def test_close_cancels_the_inflight_call():
+    async def run():
+        translator = FakeTranslator(10)
+
+        async def send(message):
+            pass
+
+        session = LiveTranslationSession(translator, send)
+        session.submit({"seq": 0, "text": "Hello", **LANGUAGES})
+        await asyncio.sleep(0.05)
+        session.close()
+        await asyncio.sleep(0.05)
+        return translator
+
+    translator = asyncio.run(run())
+    assert translator.cancelled == ["Hello"]
@@ -76,6 +76,106 @@ export async function translateText(text, sourceLang, targetLang) {
   }
 }
 
+/**
+ * Translate one text into several languages in a single request.
+ * targetLangs accepts NLLB codes (eng_Latn, ory_Orya) and 'desia'.
+ * Resolves to { translations: { [code]: text }, model, source_language }.
+ */
+export async function translateMulti(text, sourceLang, targetLangs) {
+  try {
+    const response = await fetch(`${API_BASE}/translate_multi`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        text,
+        source_language: sourceLang,
+        target_languages: targetLangs,
+      }),
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `Translation failed: ${response.status}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Multi-target translation error:', error);
+    throw error;
+  }
+}
+
+/**
+ * Open a live translation session for translate-as-you-type.
+ *
+ * Call update(text) with the full input on every change; the server only
+ * retranslates sentences that changed and drops work for outdated input.
+ * onSentence(index, translation) fires for each sentence that changed and
+ * onDone(fullTranslation, sentences) once the latest input is fully translated.
+ */
+export function createLiveTranslation({ sourceLang, targetLang, model, onSentence, onDone, onError } = {}) {
+  const nllbLangMap = {
+    'en': 'eng_Latn',
+    'english': 'eng_Latn',
+    'or': 'ory_Orya',
+    'odia': 'ory_Orya'
+  };
+  const source = nllbLangMap[sourceLang?.toLowerCase()] || sourceLang;
+  const target = nllbLangMap[targetLang?.toLowerCase()] || targetLang;
+
+  const socket = new WebSocket(`${API_BASE.replace(/^http/, 'ws')}/ws/translate`);
+  const sentences = [];
+  let seq = 0;
+  let queued = null;
+
+  socket.onopen = () => {
+    if (queued) {
+      socket.send(queued);
+      queued = null;
+    }
+  };
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === 'sentence') {
+      // Sentence updates are applied even for older input: the server only
+      // sends what differs from what this client has already received.
+      sentences[message.index] = message.translation;
+      onSentence?.(message.index, message.translation);
+    } else if (message.type === 'done' && message.seq === seq) {
+      sentences.length = message.count;
+      onDone?.(sentences.join(' '), [...sentences]);
+    } else if (message.type === 'error' && message.seq === seq) {
+      onError?.(new Error(message.detail));
+    }
+  };
+
+  socket.onerror = () => onError?.(new Error('Live translation connection failed'));
+
+  return {
+    update(text) {
+      seq += 1;
+      const payload = JSON.stringify({
+        seq,
+        text,
+        source_language: source,
+        target_language: target,
+        model,
+      });
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(payload);
+      } else {
+        queued = payload;
+      }
+    },
+    close() {
+      socket.close();
+    },
+  };
+}
+
 /**
  * Detect language of input text
  */
@@ -113,6 +213,38 @@ export async function detectLanguage(text) {
   }
 }
 
+/**
+ * Dictionary word suggestions for a typed prefix (lang: 'any', 'odia' or 'desia')
+ */
+export async function suggestWords(prefix, { lang = 'any', category, limit = 10 } = {}) {
+  const params = new URLSearchParams({ q: prefix, lang, limit: String(limit) });
+  if (category) params.set('category', category);
+  try {
+    const response = await fetch(`${API_BASE}/dictionary/suggest?${params}`);
+    if (!response.ok) {
+      throw new Error(`Suggest failed: ${response.status}`);
+    }
+    return (await response.json()).suggestions;
+  } catch (error) {
+    console.error('Dictionary suggest error:', error);
+    return [];
+  }
+}
+
+/**
+ * One page of dictionary entries; pass the returned next_cursor to get the next page
+ */
+export async function browseDictionary({ category, cursor, limit = 50 } = {}) {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (category) params.set('category', category);
+  if (cursor) params.set('cursor', cursor);
+  const response = await fetch(`${API_BASE}/dictionary/browse?${params}`);
+  if (!response.ok) {
+    throw new Error(`Browse failed: ${response.status}`);
+  }
+  return await response.json();
+}
+
 /**
  * Get list of supported languages
  */